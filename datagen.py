@@ -1,62 +1,121 @@
-import requests
-import random
-import time
-from datetime import datetime
-
-# API endpoint
-API_URL = "http://localhost:8000/data"
-
-# Configuration
-SENSOR_IDS = ["SENSOR001", "SENSOR002", "SENSOR003", "SENSOR004"]
-DEVICE_IDS = ["DEVICE123", "DEVICE456", "DEVICE789"]
-TEMP_RANGE = (15.0, 35.0)  # Temperature range in Celsius
-
-def generate_sensor_data():
-    """Generate random sensor data"""
-    data = {
-        "sensor_id": random.choice(SENSOR_IDS),
-        "device_id": random.choice(DEVICE_IDS),
-        "timestamp": datetime.now().isoformat(),
-        "temp_value": round(random.uniform(*TEMP_RANGE), 2)
-    }
-    return data
-
-def send_data(data):
-    """Send data to the FastAPI endpoint"""
-    try:
-        response = requests.post(API_URL, json=data)
-        
-        if response.status_code == 201:
-            print(f"✓ Data sent successfully: {data['sensor_id']} - {data['temp_value']}°C")
-            print(f"  Response: {response.json()['message']}\n")
-        else:
-            print(f"✗ Failed to send data. Status code: {response.status_code}")
-            print(f"  Response: {response.text}\n")
-            
-    except requests.exceptions.ConnectionError:
-        print("✗ Connection error. Make sure the FastAPI server is running on http://localhost:8000\n")
-    except Exception as e:
-        print(f"✗ Error: {str(e)}\n")
-
-def main():
-    """Main function to generate and send data"""
-    print("=" * 60)
-    print("SENSOR DATA GENERATOR")
-    print("=" * 60)
-    print("Sending data to:", API_URL)
-    print("Press Ctrl+C to stop\n")
-    
-    try:
-        while True:
-            # Generate and send data
-            sensor_data = generate_sensor_data()
-            send_data(sensor_data)
-            
-            # Wait before sending next data point
-            time.sleep(2)  # Send data every 2 seconds
-            
-    except KeyboardInterrupt:
-        print("\n\nStopped by user. Goodbye!")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import paho.mqtt.client as mqtt
+import requests
+from requests.adapters import HTTPAdapter
+import random
+import time
+import gzip
+import orjson
+import os
+from datetime import datetime
+
+# Transport selection - 'mqtt' (default) or 'http' for the REST batch path
+TRANSPORT = os.getenv('TRANSPORT', 'mqtt')
+
+# MQTT Configuration - Use environment variables
+MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
+MQTT_PORT = int(os.getenv('MQTT_PORT', '1883'))
+MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'sensor/data')
+
+# REST API endpoint (http transport)
+API_URL = os.getenv('API_URL', 'http://localhost:8000/data/batch')
+
+# Configuration
+SENSOR_IDS = ["SENSOR001", "SENSOR002", "SENSOR003", "SENSOR004"]
+DEVICE_IDS = ["DEVICE123", "DEVICE456", "DEVICE789"]
+TEMP_RANGE = (15.0, 35.0)  # Temperature range in Celsius
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '20'))  # Readings per published message
+SEND_INTERVAL = 2.0  # Seconds between samples
+
+# One shared MQTT client for the life of the process - the persistent TCP
+# connection avoids a fresh handshake per sample
+client = mqtt.Client()
+
+# One shared HTTP session so keep-alive reuses the TCP connection between
+# batches instead of reconnecting per request
+SESSION = requests.Session()
+SESSION.headers["Content-Type"] = "application/json"
+SESSION.headers["Content-Encoding"] = "gzip"
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def generate_batch(size):
+    """Generate a batch of random sensor readings in one pass"""
+    # One base timestamp per batch with index offsets, and one RNG call
+    # per field across the whole batch instead of one per sample
+    base = time.time()
+    sensor_ids = random.choices(SENSOR_IDS, k=size)
+    device_ids = random.choices(DEVICE_IDS, k=size)
+    return [
+        {
+            "sensor_id": sensor_ids[i],
+            "device_id": device_ids[i],
+            "timestamp": datetime.fromtimestamp(
+                base - (size - 1 - i) * SEND_INTERVAL
+            ).isoformat(timespec="milliseconds"),
+            "temp_value": round(random.uniform(*TEMP_RANGE), 2)
+        }
+        for i in range(size)
+    ]
+
+def send_batch(batch):
+    """Send a batch of readings over the configured transport"""
+    try:
+        payload = {"readings": batch}
+
+        if TRANSPORT == 'http':
+            response = SESSION.post(
+                API_URL, data=gzip.compress(orjson.dumps(payload)), timeout=2
+            )
+            if response.status_code == 202:
+                print(f"✓ Batch of {len(batch)} readings posted successfully\n")
+            else:
+                print(f"✗ Failed to post batch. Status code: {response.status_code}\n")
+            return
+
+        result = client.publish(MQTT_TOPIC, orjson.dumps(payload), qos=1)
+
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            print(f"✓ Batch of {len(batch)} readings published successfully\n")
+        else:
+            print(f"✗ Failed to publish batch. Return code: {result.rc}\n")
+
+    except requests.exceptions.ConnectionError:
+        print(f"✗ Connection error. Make sure the FastAPI server is running at {API_URL}\n")
+    except Exception as e:
+        print(f"✗ Error: {str(e)}\n")
+
+def main():
+    """Main function to generate and send data"""
+    print("=" * 60)
+    print("SENSOR DATA GENERATOR")
+    print("=" * 60)
+    if TRANSPORT == 'http':
+        print(f"Posting to: {API_URL}")
+    else:
+        print(f"Publishing to: {MQTT_BROKER}:{MQTT_PORT} (topic: {MQTT_TOPIC})")
+    print("Press Ctrl+C to stop\n")
+
+    if TRANSPORT != 'http':
+        try:
+            client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            client.loop_start()
+        except Exception as e:
+            print(f"✗ Connection error. Make sure the MQTT broker is running on {MQTT_BROKER}:{MQTT_PORT}")
+            print(f"  {str(e)}\n")
+            return
+
+    try:
+        while True:
+            # Generate and publish a whole batch, then wait out the window
+            # the batch covers
+            send_batch(generate_batch(BATCH_SIZE))
+            time.sleep(BATCH_SIZE * SEND_INTERVAL)
+
+    except KeyboardInterrupt:
+        print("\n\nStopped by user. Goodbye!")
+    finally:
+        if TRANSPORT != 'http':
+            client.loop_stop()
+            client.disconnect()
+
+if __name__ == "__main__":
+    main()
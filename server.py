@@ -1,339 +1,920 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from datetime import datetime
-import mysql.connector
-from mysql.connector import Error
-import paho.mqtt.client as mqtt
-import json
-import threading
-import os
-from typing import List, Optional
-
-app = FastAPI(title="Sensor Data API", version="1.0.0")
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Database configuration - Use environment variables
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'root'),
-    'database': os.getenv('DB_NAME', 'default'),
-    'port': int(os.getenv('DB_PORT', '3306'))
-}
-
-# MQTT Configuration - Use environment variables
-MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
-MQTT_PORT = int(os.getenv('MQTT_PORT', '1883'))
-MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'sensor/data')
-MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', 'sensor_server')
-
-# Pydantic model for sensor data
-class SensorData(BaseModel):
-    sensor_id: str = Field(..., description="Unique identifier for the sensor")
-    device_id: str = Field(..., description="Unique identifier for the device")
-    timestamp: datetime = Field(..., description="Timestamp of the reading")
-    temp_value: float = Field(..., description="Temperature value")
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "sensor_id": "SENSOR001",
-                "device_id": "DEVICE123",
-                "timestamp": "2025-10-22T10:30:00",
-                "temp_value": 23.5
-            }
-        }
-
-# Pydantic model for sensor reading response (includes record ID)
-class SensorReading(BaseModel):
-    id: int = Field(..., description="Database record ID")
-    sensor_id: str = Field(..., description="Unique identifier for the sensor")
-    device_id: str = Field(..., description="Unique identifier for the device")
-    timestamp: datetime = Field(..., description="Timestamp of the reading")
-    temp_value: float = Field(..., description="Temperature value")
-
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
-
-def insert_sensor_data(data: SensorData):
-    """Insert sensor data into MySQL database"""
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    try:
-        cursor = connection.cursor()
-        query = """
-            INSERT INTO sensor_data (sensor_id, device_id, timestamp, temp_value)
-            VALUES (%s, %s, %s, %s)
-        """
-        values = (data.sensor_id, data.device_id, data.timestamp, data.temp_value)
-        cursor.execute(query, values)
-        connection.commit()
-        
-        record_id = cursor.lastrowid
-        cursor.close()
-        connection.close()
-        
-        return record_id
-        
-    except Error as e:
-        print(f"Error inserting data: {e}")
-        if connection:
-            connection.close()
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-def get_latest_readings(sensor_id: str, limit: int = 10):
-    """Retrieve latest N readings for a specific sensor"""
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-            SELECT id, sensor_id, device_id, timestamp, temp_value
-            FROM sensor_data
-            WHERE sensor_id = %s
-            ORDER BY timestamp DESC, id DESC
-            LIMIT %s
-        """
-        cursor.execute(query, (sensor_id, limit))
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
-        
-    except Error as e:
-        print(f"Error retrieving data: {e}")
-        if connection:
-            connection.close()
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-def get_all_sensors():
-    """Retrieve list of unique sensor IDs"""
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    try:
-        cursor = connection.cursor()
-        query = """
-            SELECT DISTINCT sensor_id
-            FROM sensor_data
-            ORDER BY sensor_id
-        """
-        cursor.execute(query)
-        results = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        connection.close()
-        
-        return results
-        
-    except Error as e:
-        print(f"Error retrieving sensors: {e}")
-        if connection:
-            connection.close()
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-# MQTT Callbacks
-def on_connect(client, userdata, flags, rc):
-    """Callback when connected to MQTT broker"""
-    if rc == 0:
-        print("\n✓ Connected to MQTT Broker successfully!")
-        # Subscribe to the sensor data topic
-        client.subscribe(MQTT_TOPIC, qos=1)
-        print(f"✓ Subscribed to topic: {MQTT_TOPIC}\n")
-    else:
-        print(f"✗ Failed to connect to MQTT Broker. Return code: {rc}")
-
-def on_message(client, userdata, msg):
-    """Callback when a message is received from MQTT"""
-    try:
-        # Parse JSON payload
-        payload = json.loads(msg.payload.decode())
-        
-        # Convert timestamp string to datetime object
-        payload['timestamp'] = datetime.fromisoformat(payload['timestamp'])
-        
-        # Create SensorData object
-        sensor_data = SensorData(**payload)
-        
-        # Insert into database
-        record_id = insert_sensor_data(sensor_data)
-        
-        # Print received data to console
-        print("\n" + "="*50)
-        print("SENSOR DATA RECEIVED VIA MQTT:")
-        print("="*50)
-        print(f"Record ID:    {record_id}")
-        print(f"Sensor ID:    {sensor_data.sensor_id}")
-        print(f"Device ID:    {sensor_data.device_id}")
-        print(f"Timestamp:    {sensor_data.timestamp}")
-        print(f"Temperature:  {sensor_data.temp_value}°C")
-        print("="*50 + "\n")
-        
-    except json.JSONDecodeError as e:
-        print(f"✗ Error decoding JSON: {e}")
-    except Exception as e:
-        print(f"✗ Error processing message: {e}")
-
-def on_disconnect(client, userdata, rc):
-    """Callback when disconnected from MQTT broker"""
-    if rc != 0:
-        print("✗ Unexpected disconnection from MQTT Broker")
-
-def start_mqtt_client():
-    """Initialize and start MQTT client in a separate thread"""
-    mqtt_client = mqtt.Client(client_id=MQTT_CLIENT_ID)
-    
-    # Set callbacks
-    mqtt_client.on_connect = on_connect
-    mqtt_client.on_message = on_message
-    mqtt_client.on_disconnect = on_disconnect
-    
-    try:
-        print(f"Connecting to MQTT Broker at {MQTT_BROKER}:{MQTT_PORT}...")
-        mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        
-        # Start the MQTT loop in a separate thread
-        mqtt_client.loop_start()
-        
-    except Exception as e:
-        print(f"✗ Failed to connect to MQTT Broker: {e}")
-
-# POST endpoint to receive sensor data (REST API fallback)
-@app.post("/data", status_code=201)
-async def submit_sensor_data(data: SensorData):
-    """
-    Submit new sensor data and store in MySQL database (REST API endpoint)
-    """
-    # Insert data into database
-    record_id = insert_sensor_data(data)
-    
-    # Print received data to console
-    print("\n" + "="*50)
-    print("SENSOR DATA RECEIVED VIA REST API:")
-    print("="*50)
-    print(f"Record ID:    {record_id}")
-    print(f"Sensor ID:    {data.sensor_id}")
-    print(f"Device ID:    {data.device_id}")
-    print(f"Timestamp:    {data.timestamp}")
-    print(f"Temperature:  {data.temp_value}°C")
-    print("="*50 + "\n")
-    
-    return {
-        "status": "success",
-        "message": "Sensor data received and stored in database",
-        "record_id": record_id,
-        "data": {
-            "sensor_id": data.sensor_id,
-            "device_id": data.device_id,
-            "timestamp": data.timestamp.isoformat(),
-            "temp_value": data.temp_value
-        }
-    }
-
-# GET endpoint to retrieve latest readings for a specific sensor
-@app.get("/sensors/{sensor_id}/readings", response_model=List[SensorReading])
-async def get_sensor_readings(
-    sensor_id: str,
-    limit: int = Query(default=10, ge=1, le=100, description="Number of readings to retrieve")
-):
-    """
-    Get the latest N readings for a specific sensor (default: 10, max: 100)
-    
-    Example: /sensors/sensor1/readings?limit=10
-    """
-    readings = get_latest_readings(sensor_id, limit)
-    
-    if not readings:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"No readings found for sensor: {sensor_id}"
-        )
-    
-    return readings
-
-# GET endpoint to retrieve list of all sensors
-@app.get("/sensors", response_model=List[str])
-async def list_sensors():
-    """
-    Get a list of all unique sensor IDs that have recorded data
-    """
-    sensors = get_all_sensors()
-    
-    if not sensors:
-        return []
-    
-    return sensors
-
-@app.get("/")
-async def root():
-    """Root endpoint to check if API is running"""
-    return {
-        "message": "Sensor Data API is running",
-        "version": "1.0.0",
-        "endpoints": {
-            "POST /data": "Submit sensor data",
-            "GET /sensors": "List all sensors",
-            "GET /sensors/{sensor_id}/readings": "Get latest readings for a sensor",
-            "GET /docs": "API documentation"
-        }
-    }
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    # Check database connection
-    db_status = "connected"
-    try:
-        connection = get_db_connection()
-        if connection:
-            connection.close()
-        else:
-            db_status = "disconnected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    
-    return {
-        "status": "healthy",
-        "database": db_status,
-        "mqtt_broker": MQTT_BROKER,
-        "mqtt_port": MQTT_PORT
-    }
-
-@app.on_event("startup")
-async def startup_event():
-    """Start MQTT client when FastAPI starts"""
-    print("\n" + "="*60)
-    print("SENSOR DATA API SERVER STARTING")
-    print("="*60)
-    print(f"Database Host: {DB_CONFIG['host']}")
-    print(f"Database Name: {DB_CONFIG['database']}")
-    print(f"Database User: {DB_CONFIG['user']}")
-    print(f"MQTT Broker: {MQTT_BROKER}:{MQTT_PORT}")
-    print("="*60 + "\n")
-    start_mqtt_client()
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from datetime import datetime, timedelta
+import asyncio
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
+import paho.mqtt.client as mqtt
+import threading
+import time
+import fcntl
+import gzip
+import zlib
+import logging
+import logging.handlers
+import queue
+import os
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Optional
+
+# Logging - a QueueHandler hands records to a listener thread so the
+# ingest hot path never blocks on a stdout flush
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger("sensor")
+logger.setLevel(os.getenv('LOG_LEVEL', 'WARNING'))
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(
+    log_queue, logging.StreamHandler()
+)
+log_listener.start()
+
+class GzipRequestMiddleware:
+    """Transparently decompress request bodies sent with Content-Encoding: gzip"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            if headers.get(b"content-encoding", b"").lower() == b"gzip":
+                body = b""
+                more_body = True
+                while more_body:
+                    message = await receive()
+                    body += message.get("body", b"")
+                    more_body = message.get("more_body", False)
+                try:
+                    body = gzip.decompress(body)
+                except (OSError, EOFError, zlib.error):
+                    await send({
+                        "type": "http.response.start",
+                        "status": 400,
+                        "headers": [(b"content-type", b"application/json")],
+                    })
+                    await send({
+                        "type": "http.response.body",
+                        "body": b'{"detail":"Request body is not valid gzip"}',
+                    })
+                    return
+
+                scope = dict(scope)
+                scope["headers"] = [
+                    (name, value) for name, value in scope["headers"]
+                    if name not in (b"content-encoding", b"content-length")
+                ] + [(b"content-length", str(len(body)).encode())]
+
+                consumed = False
+
+                async def wrapped_receive():
+                    nonlocal consumed
+                    if consumed:
+                        return {"type": "http.disconnect"}
+                    consumed = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+
+                await self.app(scope, wrapped_receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+app = FastAPI(
+    title="Sensor Data API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Accept gzip-compressed request bodies and compress large responses -
+# repetitive JSON keys in batch payloads compress very well
+app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# Database configuration - Use environment variables
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', 'root'),
+    'database': os.getenv('DB_NAME', 'default'),
+    'port': int(os.getenv('DB_PORT', '3306'))
+}
+
+# MQTT Configuration - Use environment variables
+MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
+MQTT_PORT = int(os.getenv('MQTT_PORT', '1883'))
+MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'sensor/data')
+MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', 'sensor_server')
+# QoS 0 avoids a PUBACK round trip per message; set to 1 if loss matters
+MQTT_QOS = int(os.getenv('MQTT_QOS', '0'))
+
+# Write batching configuration - inserts are buffered in memory and flushed
+# in bulk so we pay one transaction per batch instead of one per message
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
+FLUSH_INTERVAL_SEC = float(os.getenv('FLUSH_INTERVAL_MS', '500')) / 1000.0
+# Upper bound on queued rows - beyond this, new readings are rejected so an
+# unreachable database cannot grow the process without limit
+MAX_QUEUE_SIZE = int(os.getenv('MAX_QUEUE_SIZE', '100000'))
+
+write_queue = deque()
+write_queue_lock = threading.Lock()
+flush_event = threading.Event()
+
+INSERT_SQL_PREFIX = (
+    "INSERT INTO sensor_data (sensor_id, device_id, timestamp, temp_value) VALUES "
+)
+# Rows per multi-VALUES statement - keeps the packet under max_allowed_packet
+MAX_ROWS_PER_INSERT = 500
+
+# Downsampling configuration - a reading is dropped when the sensor was
+# persisted less than COOLDOWN ago and the temperature barely moved
+COOLDOWN = timedelta(seconds=int(os.getenv('COOLDOWN_SEC', '30')))
+TEMP_DELTA = float(os.getenv('TEMP_DELTA', '0.5'))
+
+last_seen = {}
+last_value = {}
+persisted_count = 0
+downsampled_count = 0
+dropped_count = 0
+
+# Sensor IDs seen so far - avoids a DISTINCT full-table scan on GET /sensors.
+# The set only covers this process's lifetime until the historical IDs have
+# been merged from MySQL once
+known_sensors = set()
+sensors_db_synced = False
+
+# Per-sensor ring buffer of the most recent readings (newest first) so the
+# common "latest N" dashboard query never touches MySQL once warm. A ring
+# that has not been touched within RING_TTL_SEC is considered stale - in a
+# worker that does not ingest, a DB-warmed ring would otherwise serve the
+# same snapshot forever
+RECENT_MAXLEN = 100
+RING_TTL_SEC = float(os.getenv('RING_TTL_SEC', '30'))
+recent = defaultdict(lambda: deque(maxlen=RECENT_MAXLEN))
+recent_updated_at = {}
+
+# Memoized sorted sensor list - rebuilt when a new sensor_id appears locally
+# and re-merged from MySQL once SENSORS_MAX_AGE expires, so workers that do
+# not ingest still pick up sensors other processes persisted
+sensors_cache = None
+sensors_cache_built_at = 0.0
+SENSORS_MAX_AGE = int(os.getenv('SENSORS_MAX_AGE', '30'))
+
+# Days of partitioned history to keep before old partitions are dropped
+PARTITION_RETENTION_DAYS = int(os.getenv('PARTITION_RETENTION_DAYS', '30'))
+
+# Pydantic model for sensor data
+class SensorData(BaseModel):
+    sensor_id: str = Field(..., description="Unique identifier for the sensor")
+    device_id: str = Field(..., description="Unique identifier for the device")
+    timestamp: datetime = Field(..., description="Timestamp of the reading")
+    temp_value: float = Field(..., description="Temperature value")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "sensor_id": "SENSOR001",
+                "device_id": "DEVICE123",
+                "timestamp": "2025-10-22T10:30:00",
+                "temp_value": 23.5
+            }
+        }
+
+# Pydantic model for a batch of sensor readings
+class SensorBatch(BaseModel):
+    readings: List[SensorData] = Field(..., description="List of sensor readings")
+
+# Adapter for bare-list payloads - validates JSON bytes in pydantic-core
+READINGS_ADAPTER = TypeAdapter(List[SensorData])
+
+# Pydantic model for sensor reading response (includes record ID when the
+# reading was served from MySQL; readings still in flight have no ID yet)
+class SensorReading(BaseModel):
+    id: Optional[int] = Field(None, description="Database record ID")
+    sensor_id: str = Field(..., description="Unique identifier for the sensor")
+    device_id: str = Field(..., description="Unique identifier for the device")
+    timestamp: datetime = Field(..., description="Timestamp of the reading")
+    temp_value: float = Field(..., description="Temperature value")
+
+# Connection pool - created lazily so the app can start before MySQL is up
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '20'))
+
+db_pool = None
+db_pool_lock = threading.Lock()
+
+def get_db_connection():
+    """Check out a database connection from the pool"""
+    global db_pool
+    try:
+        if db_pool is None:
+            with db_pool_lock:
+                if db_pool is None:
+                    db_pool = MySQLConnectionPool(
+                        pool_name="sensors",
+                        pool_size=POOL_SIZE,
+                        **DB_CONFIG
+                    )
+        return db_pool.get_connection()
+    except Error as e:
+        logger.error(f"Error connecting to MySQL: {e}")
+        return None
+
+def should_persist(data: SensorData) -> bool:
+    """Decide whether a reading passes the cooldown/delta filter"""
+    global persisted_count, downsampled_count, sensors_cache
+    now = datetime.now()
+    seen = last_seen.get(data.sensor_id)
+    if (seen is not None
+            and now - seen < COOLDOWN
+            and abs(data.temp_value - last_value[data.sensor_id]) < TEMP_DELTA):
+        downsampled_count += 1
+        return False
+    last_seen[data.sensor_id] = now
+    last_value[data.sensor_id] = data.temp_value
+    if data.sensor_id not in known_sensors:
+        known_sensors.add(data.sensor_id)
+        # Invalidate the memoized /sensors response
+        sensors_cache = None
+    persisted_count += 1
+    return True
+
+def remember_reading(data: SensorData):
+    """Push a reading onto its sensor's ring buffer (newest first)"""
+    recent[data.sensor_id].appendleft({
+        "id": None,
+        "sensor_id": data.sensor_id,
+        "device_id": data.device_id,
+        "timestamp": data.timestamp,
+        "temp_value": data.temp_value
+    })
+    recent_updated_at[data.sensor_id] = time.time()
+
+def enqueue_sensor_data(data: SensorData) -> bool:
+    """Queue sensor data for the background flusher instead of inserting inline.
+
+    Returns False when the reading was rejected because the queue is full.
+    """
+    global dropped_count
+    if len(write_queue) >= MAX_QUEUE_SIZE:
+        dropped_count += 1
+        flush_event.set()
+        return False
+    if not should_persist(data):
+        return True
+    remember_reading(data)
+    row = (data.sensor_id, data.device_id, data.timestamp, data.temp_value)
+    with write_queue_lock:
+        write_queue.append(row)
+        pending = len(write_queue)
+    if pending >= BATCH_SIZE:
+        flush_event.set()
+    return True
+
+def enqueue_sensor_batch(readings: List[SensorData]) -> bool:
+    """Queue a batch of readings under a single lock acquisition.
+
+    Returns False when the batch was rejected because the queue is full.
+    """
+    global dropped_count
+    if len(write_queue) >= MAX_QUEUE_SIZE:
+        dropped_count += len(readings)
+        flush_event.set()
+        return False
+    rows = []
+    for r in readings:
+        if should_persist(r):
+            remember_reading(r)
+            rows.append((r.sensor_id, r.device_id, r.timestamp, r.temp_value))
+    if not rows:
+        return True
+    with write_queue_lock:
+        write_queue.extend(rows)
+        pending = len(write_queue)
+    if pending >= BATCH_SIZE:
+        flush_event.set()
+    return True
+
+# Long-lived connection and cursor owned by the flusher thread - one session
+# carries every batch so there is no per-flush connect cost
+flush_connection = None
+flush_cursor = None
+
+def get_flush_cursor():
+    """Return the flusher's cursor, (re)connecting if needed"""
+    global flush_connection, flush_cursor
+    if flush_cursor is None:
+        try:
+            flush_connection = mysql.connector.connect(**DB_CONFIG)
+            flush_cursor = flush_connection.cursor()
+        except Error as e:
+            logger.error(f"Error connecting flusher to MySQL: {e}")
+            flush_connection = None
+            flush_cursor = None
+    return flush_cursor
+
+def reset_flush_cursor():
+    """Discard the flusher's connection so the next flush reconnects"""
+    global flush_connection, flush_cursor
+    try:
+        if flush_cursor is not None:
+            flush_cursor.close()
+        if flush_connection is not None:
+            flush_connection.close()
+    except Error:
+        pass
+    flush_connection = None
+    flush_cursor = None
+
+def flush_write_queue():
+    """Drain the write queue and insert all pending rows in one transaction"""
+    with write_queue_lock:
+        if not write_queue:
+            return 0
+        rows = list(write_queue)
+        write_queue.clear()
+
+    cursor = get_flush_cursor()
+    if cursor is None:
+        # Put the rows back at the head so they are retried on the next flush
+        with write_queue_lock:
+            write_queue.extendleft(reversed(rows))
+        return 0
+
+    try:
+        # One multi-VALUES statement per chunk - a single round trip and a
+        # single parse for up to MAX_ROWS_PER_INSERT rows
+        for start in range(0, len(rows), MAX_ROWS_PER_INSERT):
+            chunk = rows[start:start + MAX_ROWS_PER_INSERT]
+            placeholders = ",".join(["(%s,%s,%s,%s)"] * len(chunk))
+            flat = [value for row in chunk for value in row]
+            cursor.execute(INSERT_SQL_PREFIX + placeholders, flat)
+        flush_connection.commit()
+
+        return len(rows)
+
+    except Error as e:
+        logger.error(f"Error flushing batch: {e}")
+        # The connection may be gone - rebuild it on the next flush
+        reset_flush_cursor()
+        with write_queue_lock:
+            write_queue.extendleft(reversed(rows))
+        return 0
+
+def batch_flusher():
+    """Background loop that flushes the write queue every BATCH_SIZE rows or FLUSH_INTERVAL_SEC"""
+    while True:
+        flush_event.wait(timeout=FLUSH_INTERVAL_SEC)
+        flush_event.clear()
+        flush_write_queue()
+
+def start_batch_flusher():
+    """Start the batch flusher daemon thread"""
+    flusher_thread = threading.Thread(target=batch_flusher, daemon=True)
+    flusher_thread.start()
+    logger.info(f"Batch flusher started (batch size: {BATCH_SIZE}, interval: {FLUSH_INTERVAL_SEC}s)")
+
+def get_latest_readings(sensor_id: str, limit: int = 10):
+    """Retrieve latest N readings for a specific sensor"""
+    connection = get_db_connection()
+    if connection is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        query = """
+            SELECT id, sensor_id, device_id, timestamp, temp_value
+            FROM sensor_data
+            WHERE sensor_id = %s
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """
+        cursor.execute(query, (sensor_id, limit))
+        results = cursor.fetchall()
+
+        cursor.close()
+
+        return results
+
+    except Error as e:
+        logger.error(f"Error retrieving data: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        connection.close()
+
+def ensure_indexes():
+    """Create the composite index get_latest_readings relies on (idempotent)"""
+    connection = get_db_connection()
+    if connection is None:
+        logger.warning("Skipping index creation - database unavailable")
+        return
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE INDEX idx_sensor_ts_desc
+            ON sensor_data (sensor_id, timestamp DESC, id DESC)
+        """)
+        connection.commit()
+        cursor.close()
+        logger.info("Created index idx_sensor_ts_desc on sensor_data")
+
+    except Error as e:
+        # 1061 = index already exists, which is fine
+        if getattr(e, 'errno', None) == 1061:
+            logger.info("Index idx_sensor_ts_desc already exists")
+        else:
+            logger.error(f"Error creating index: {e}")
+    finally:
+        connection.close()
+
+def tune_innodb():
+    """Relax InnoDB durability so group commit can coalesce log writes.
+
+    Telemetry tolerates losing up to a second of readings on a crash, so
+    fsync moves from every commit to the background log flush. Needs the
+    SUPER privilege; the preferred deploy-time equivalent in my.cnf is:
+
+        innodb_flush_log_at_trx_commit = 2
+        sync_binlog = 0
+        innodb_flush_neighbors = 0
+        innodb_io_capacity = 2000
+    """
+    connection = get_db_connection()
+    if connection is None:
+        logger.warning("Skipping InnoDB tuning - database unavailable")
+        return
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET GLOBAL innodb_flush_log_at_trx_commit = 2")
+        cursor.execute("SET GLOBAL sync_binlog = 0")
+        cursor.close()
+        logger.info("Relaxed InnoDB durability for write-heavy ingest")
+
+    except Error as e:
+        # Typically a missing SUPER privilege - fall back to my.cnf
+        logger.warning(f"Could not tune InnoDB (set it in my.cnf instead): {e}")
+    finally:
+        connection.close()
+
+def ensure_partitioning():
+    """Partition sensor_data by day so stale data can be dropped cheaply"""
+    connection = get_db_connection()
+    if connection is None:
+        logger.warning("Skipping partitioning - database unavailable")
+        return
+
+    pk_columns = []
+    try:
+        cursor = connection.cursor()
+        # Skip if the table is already partitioned
+        cursor.execute("""
+            SELECT partition_name
+            FROM information_schema.partitions
+            WHERE table_schema = %s
+              AND table_name = 'sensor_data'
+              AND partition_name IS NOT NULL
+        """, (DB_CONFIG['database'],))
+        if cursor.fetchall():
+            logger.info("sensor_data is already partitioned")
+            cursor.close()
+            return
+
+        # MySQL requires the partitioning column in every unique key, so a
+        # plain PRIMARY KEY (id) must be widened to (id, timestamp) first
+        cursor.execute("""
+            SELECT column_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema = %s
+              AND table_name = 'sensor_data'
+              AND constraint_name = 'PRIMARY'
+            ORDER BY ordinal_position
+        """, (DB_CONFIG['database'],))
+        pk_columns = [row[0] for row in cursor.fetchall()]
+        if pk_columns and 'timestamp' not in pk_columns:
+            cursor.execute("""
+                ALTER TABLE sensor_data
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, timestamp)
+            """)
+            connection.commit()
+            logger.info("Extended sensor_data primary key to (id, timestamp)")
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        cursor.execute(f"""
+            ALTER TABLE sensor_data
+            PARTITION BY RANGE (TO_DAYS(timestamp)) (
+                PARTITION p_init VALUES LESS THAN (TO_DAYS('{today}')),
+                PARTITION p_future VALUES LESS THAN MAXVALUE
+            )
+        """)
+        connection.commit()
+        cursor.close()
+        logger.info("Partitioned sensor_data by RANGE (TO_DAYS(timestamp))")
+
+    except Error as e:
+        # 1503 = a unique key still lacks the partitioning column
+        if getattr(e, 'errno', None) == 1503:
+            logger.error(
+                "Cannot partition sensor_data: every unique key must include "
+                "the timestamp column (got primary key %s). Widen the keys "
+                "and restart: %s", pk_columns, e
+            )
+        else:
+            logger.error(f"Error partitioning sensor_data: {e}")
+    finally:
+        connection.close()
+
+def roll_partitions():
+    """Seal the finished days into their own partition and drop expired ones"""
+    connection = get_db_connection()
+    if connection is None:
+        logger.warning("Skipping partition roll - database unavailable")
+        return
+
+    try:
+        cursor = connection.cursor()
+        today = datetime.now()
+        cursor.execute(f"""
+            ALTER TABLE sensor_data
+            REORGANIZE PARTITION p_future INTO (
+                PARTITION p_{today.strftime('%Y%m%d')}
+                    VALUES LESS THAN (TO_DAYS('{today.strftime('%Y-%m-%d')}')),
+                PARTITION p_future VALUES LESS THAN MAXVALUE
+            )
+        """)
+        connection.commit()
+
+        # Drop day partitions past the retention window
+        cutoff = 'p_' + (today - timedelta(days=PARTITION_RETENTION_DAYS)).strftime('%Y%m%d')
+        cursor.execute("""
+            SELECT partition_name
+            FROM information_schema.partitions
+            WHERE table_schema = %s
+              AND table_name = 'sensor_data'
+              AND partition_name LIKE 'p\\_2%%'
+        """, (DB_CONFIG['database'],))
+        expired = [row[0] for row in cursor.fetchall() if row[0] < cutoff]
+        for name in expired:
+            cursor.execute(f"ALTER TABLE sensor_data DROP PARTITION {name}")
+            connection.commit()
+            logger.info(f"Dropped expired partition {name}")
+
+        cursor.close()
+
+    except Error as e:
+        # 1517 = duplicate partition name - today's partition already exists
+        if getattr(e, 'errno', None) == 1517:
+            logger.info("Today's partition already exists")
+        else:
+            logger.error(f"Error rolling partitions: {e}")
+    finally:
+        connection.close()
+
+def partition_maintenance():
+    """Background loop that rolls partitions once a day"""
+    while True:
+        time.sleep(86400)
+        roll_partitions()
+
+def start_partition_maintenance():
+    """Start the daily partition maintenance daemon thread"""
+    maintenance_thread = threading.Thread(target=partition_maintenance, daemon=True)
+    maintenance_thread.start()
+    logger.info(f"Partition maintenance started (retention: {PARTITION_RETENTION_DAYS} days)")
+
+def get_all_sensors():
+    """Retrieve list of unique sensor IDs"""
+    global sensors_cache
+
+    global sensors_db_synced, sensors_cache_built_at
+
+    now = time.time()
+
+    # Serve the memoized list while it is fresh - DISTINCT over a growing
+    # table is a full scan per call
+    if sensors_cache is not None:
+        if now - sensors_cache_built_at < SENSORS_MAX_AGE:
+            return sensors_cache
+        # TTL expired - fall through and re-merge from MySQL so sensors
+        # ingested by other workers show up here too
+    elif sensors_db_synced:
+        # Invalidated by a brand-new local sensor - the historical IDs are
+        # already merged, so the in-memory set is enough for this rebuild
+        sensors_cache = sorted(known_sensors)
+        sensors_cache_built_at = now
+        return sensors_cache
+
+    connection = get_db_connection()
+    if connection is None:
+        if known_sensors:
+            # Degraded: serve what we have without caching so the DB merge
+            # is retried on the next call
+            return sorted(known_sensors)
+        raise HTTPException(status_code=500, detail="Database connection failed")
+
+    try:
+        cursor = connection.cursor()
+        query = """
+            SELECT DISTINCT sensor_id
+            FROM sensor_data
+            ORDER BY sensor_id
+        """
+        cursor.execute(query)
+        results = [row[0] for row in cursor.fetchall()]
+
+        cursor.close()
+
+        # Merge the historical IDs into the in-memory set so later calls
+        # (and rebuilds) skip the DB
+        known_sensors.update(results)
+        sensors_db_synced = True
+        sensors_cache = sorted(known_sensors)
+        sensors_cache_built_at = now
+
+        return sensors_cache
+
+    except Error as e:
+        logger.error(f"Error retrieving sensors: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        connection.close()
+
+# MQTT Callbacks
+def on_connect(client, userdata, flags, rc):
+    """Callback when connected to MQTT broker"""
+    if rc == 0:
+        logger.info("Connected to MQTT Broker successfully")
+        # Subscribe to the sensor data topic
+        client.subscribe(MQTT_TOPIC, qos=MQTT_QOS)
+        logger.info(f"Subscribed to topic: {MQTT_TOPIC}")
+    else:
+        logger.error(f"Failed to connect to MQTT Broker. Return code: {rc}")
+
+# Worker pool that processes MQTT payloads off paho's network thread, so
+# validation and queueing never stall packet reads
+MQTT_WORKERS = int(os.getenv('MQTT_WORKERS', '8'))
+mqtt_executor = ThreadPoolExecutor(max_workers=MQTT_WORKERS)
+
+def process_payload(payload):
+    """Validate a raw MQTT payload and queue its readings for insert"""
+    try:
+        # Validate straight from JSON bytes in pydantic-core - no separate
+        # Python-level parse or manual datetime conversion
+        payload = payload.strip()
+        if payload.startswith(b'['):
+            readings = READINGS_ADAPTER.validate_json(payload)
+        else:
+            try:
+                readings = SensorBatch.model_validate_json(payload).readings
+            except ValidationError:
+                readings = [SensorData.model_validate_json(payload)]
+
+        # Queue for batched insert
+        if not enqueue_sensor_batch(readings):
+            logger.warning("Write queue full - dropped %d MQTT reading(s)",
+                           len(readings))
+            return
+
+        logger.debug("MQTT message received: %d reading(s)", len(readings))
+
+    except ValidationError as e:
+        logger.error(f"Invalid sensor payload: {e}")
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+
+def on_message(client, userdata, msg):
+    """Callback when a message is received from MQTT"""
+    # Hand off immediately so the network thread keeps reading packets
+    mqtt_executor.submit(process_payload, msg.payload)
+
+def on_disconnect(client, userdata, rc):
+    """Callback when disconnected from MQTT broker"""
+    if rc != 0:
+        logger.warning("Unexpected disconnection from MQTT Broker")
+
+def start_mqtt_client():
+    """Initialize and start MQTT client in a separate thread"""
+    mqtt_client = mqtt.Client(client_id=MQTT_CLIENT_ID)
+
+    # Let QoS>0 messages pipeline instead of serializing on PUBACKs
+    mqtt_client.max_inflight_messages_set(1000)
+    mqtt_client.max_queued_messages_set(100000)
+
+    # Set callbacks
+    mqtt_client.on_connect = on_connect
+    mqtt_client.on_message = on_message
+    mqtt_client.on_disconnect = on_disconnect
+    
+    try:
+        logger.info(f"Connecting to MQTT Broker at {MQTT_BROKER}:{MQTT_PORT}...")
+        mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        
+        # Start the MQTT loop in a separate thread
+        mqtt_client.loop_start()
+        
+    except Exception as e:
+        logger.error(f"Failed to connect to MQTT Broker: {e}")
+
+# With multiple uvicorn workers only one process may consume MQTT and run
+# the DDL/partition maintenance; an exclusive file lock elects that worker
+INGEST_LOCK_FILE = os.getenv('INGEST_LOCK_FILE', '/tmp/sensewatch_ingest.lock')
+ingest_lock_handle = None
+
+def acquire_ingest_lock():
+    """Return True in exactly one worker - the one that runs ingest"""
+    global ingest_lock_handle
+    try:
+        ingest_lock_handle = open(INGEST_LOCK_FILE, 'w')
+        fcntl.flock(ingest_lock_handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+# POST endpoint to receive sensor data (REST API fallback)
+@app.post("/data", status_code=202)
+async def submit_sensor_data(data: SensorData):
+    """
+    Submit new sensor data for batched storage in MySQL (REST API endpoint)
+    """
+    # Queue data for batched insert
+    if not enqueue_sensor_data(data):
+        raise HTTPException(
+            status_code=503,
+            detail="Write queue is full, try again later"
+        )
+    request_id = str(uuid.uuid4())
+
+    logger.debug("REST reading received: %s %s %s %s°C (request %s)",
+                 data.sensor_id, data.device_id, data.timestamp,
+                 data.temp_value, request_id)
+
+    return {
+        "status": "accepted",
+        "message": "Sensor data queued for storage",
+        "request_id": request_id,
+        "data": {
+            "sensor_id": data.sensor_id,
+            "device_id": data.device_id,
+            "timestamp": data.timestamp.isoformat(),
+            "temp_value": data.temp_value
+        }
+    }
+
+# POST endpoint to receive a batch of sensor readings in one request
+@app.post("/data/batch", status_code=202)
+async def submit_sensor_batch(batch: SensorBatch):
+    """
+    Submit a batch of sensor readings for batched storage in MySQL
+    """
+    if not enqueue_sensor_batch(batch.readings):
+        raise HTTPException(
+            status_code=503,
+            detail="Write queue is full, try again later"
+        )
+    request_id = str(uuid.uuid4())
+
+    return {
+        "status": "accepted",
+        "message": f"{len(batch.readings)} readings queued for storage",
+        "request_id": request_id,
+        "count": len(batch.readings)
+    }
+
+# GET endpoint to retrieve latest readings for a specific sensor
+@app.get("/sensors/{sensor_id}/readings", response_model=List[SensorReading])
+async def get_sensor_readings(
+    sensor_id: str,
+    limit: int = Query(default=10, ge=1, le=100, description="Number of readings to retrieve")
+):
+    """
+    Get the latest N readings for a specific sensor (default: 10, max: 100)
+    
+    Example: /sensors/sensor1/readings?limit=10
+    """
+    # Serve read-your-writes from the in-memory ring when it holds enough
+    # and was touched recently enough to be trusted. Plain .get - only the
+    # write path may materialize ring entries, or arbitrary sensor_ids in
+    # requests would grow the dict without bound
+    ring = recent.get(sensor_id)
+    fresh = time.time() - recent_updated_at.get(sensor_id, 0) < RING_TTL_SEC
+    if ring is not None and fresh and len(ring) >= limit:
+        return list(islice(ring, limit))
+
+    # Run the blocking MySQL call in a worker thread so the event loop stays free
+    readings = await asyncio.to_thread(get_latest_readings, sensor_id, limit)
+
+    # Warm the ring lazily so the next call after a restart hits memory,
+    # and refresh a stale ring with the just-read rows
+    if readings and (not fresh or ring is None or len(readings) > len(ring)):
+        recent[sensor_id] = deque(readings, maxlen=RECENT_MAXLEN)
+        recent_updated_at[sensor_id] = time.time()
+    
+    if not readings:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No readings found for sensor: {sensor_id}"
+        )
+    
+    return readings
+
+# GET endpoint to retrieve list of all sensors
+@app.get("/sensors", response_model=List[str])
+async def list_sensors(response: Response):
+    """
+    Get a list of all unique sensor IDs that have recorded data
+    """
+    sensors = await asyncio.to_thread(get_all_sensors)
+
+    # Let browsers/proxies reuse the response for a short window
+    response.headers["Cache-Control"] = f"max-age={SENSORS_MAX_AGE}"
+
+    if not sensors:
+        return []
+
+    return sensors
+
+@app.get("/")
+async def root():
+    """Root endpoint to check if API is running"""
+    return {
+        "message": "Sensor Data API is running",
+        "version": "1.0.0",
+        "endpoints": {
+            "POST /data": "Submit sensor data",
+            "GET /sensors": "List all sensors",
+            "GET /sensors/{sensor_id}/readings": "Get latest readings for a sensor",
+            "GET /docs": "API documentation"
+        }
+    }
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    # Check database connection
+    db_status = "connected"
+    try:
+        connection = await asyncio.to_thread(get_db_connection)
+        if connection:
+            connection.close()
+        else:
+            db_status = "disconnected"
+    except Exception as e:
+        db_status = f"error: {str(e)}"
+    
+    return {
+        "status": "healthy",
+        "database": db_status,
+        "mqtt_broker": MQTT_BROKER,
+        "mqtt_port": MQTT_PORT,
+        "readings_persisted": persisted_count,
+        "readings_downsampled": downsampled_count,
+        "readings_dropped": dropped_count,
+        "write_queue_depth": len(write_queue)
+    }
+
+@app.on_event("startup")
+async def startup_event():
+    """Start MQTT client when FastAPI starts"""
+    logger.info("Sensor Data API server starting")
+    logger.info("Database: %s@%s/%s", DB_CONFIG['user'], DB_CONFIG['host'],
+                DB_CONFIG['database'])
+    logger.info("MQTT Broker: %s:%s", MQTT_BROKER, MQTT_PORT)
+    # Every worker flushes its own write queue - REST ingest appends to
+    # per-process state, so a worker without a flusher would leak rows
+    start_batch_flusher()
+    if acquire_ingest_lock():
+        logger.info("This worker owns MQTT ingest and DB maintenance")
+        await asyncio.to_thread(ensure_indexes)
+        await asyncio.to_thread(ensure_partitioning)
+        await asyncio.to_thread(tune_innodb)
+        start_partition_maintenance()
+        start_mqtt_client()
+    else:
+        logger.info("Another worker owns MQTT ingest - serving HTTP and "
+                    "flushing local writes only")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv('WEB_CONCURRENCY', str(max(2, os.cpu_count() or 1)))),
+        loop="uvloop",
+        http="httptools",
+    )